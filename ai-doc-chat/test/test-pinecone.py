@@ -5,19 +5,32 @@ Install: pip install pinecone
 Run: python test-pinecone.py
 """
 
+import math
 import os
+import random
 from pinecone import Pinecone
 
 # Pinecone configuration
 PINECONE_API_KEY = os.getenv('PINECONE_API_KEY', 'pcsk_tsubm_Tdk7FkZ7a63Jbrj3UejXbHyft41kiQaRCwbsmctcpX7QgvkoupDdc993SD7t2iq')
 INDEX_NAME = 'kb-vector4-dongikai'  # Your index name
 
+# Initialize Pinecone once at module scope so repeated calls (or a warm
+# Lambda adaptation of this checker) reuse the HTTPS connection pool
+# instead of paying a fresh TLS handshake per call
+pc = Pinecone(api_key=PINECONE_API_KEY)
+
+_index = None
+
+def get_index():
+    """Create the Index handle once and keep its connection pool warm"""
+    global _index
+    if _index is None:
+        _index = pc.Index(INDEX_NAME, pool_threads=8)
+    return _index
+
 def check_pinecone():
     print("🔍 Checking Pinecone Index...\n")
-    
-    # Initialize Pinecone
-    pc = Pinecone(api_key=PINECONE_API_KEY)
-    
+
     # List all available indexes
     print("📋 Available Indexes:")
     indexes = pc.list_indexes()
@@ -30,9 +43,9 @@ def check_pinecone():
     
     print(f"\n🎯 Checking index: {INDEX_NAME}\n")
     
-    # Get index
-    index = pc.Index(INDEX_NAME)
-    
+    # Get index (cached handle with a warm connection pool)
+    index = get_index()
+
     # Get index stats
     stats = index.describe_index_stats()
     
@@ -50,8 +63,13 @@ def check_pinecone():
     # Test query
     print("\n🔎 Testing Query...")
     try:
-        # Create a dummy vector for testing
-        test_vector = [0.1] * stats.dimension
+        # Probe with a seeded, L2-normalized random vector: a realistic
+        # direction the ANN index can traverse normally. A uniform dummy
+        # vector collapses into one cluster and skews query timing.
+        rng = random.Random(0)
+        raw = [rng.gauss(0, 1) for _ in range(stats.dimension)]
+        norm = math.sqrt(sum(x * x for x in raw)) or 1.0
+        test_vector = [x / norm for x in raw]
         results = index.query(
             vector=test_vector,
             top_k=3,
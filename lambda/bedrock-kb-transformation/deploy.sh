@@ -89,9 +89,20 @@ EOF
     sleep 10
 fi
 
-# Package Lambda function
+# Package Lambda function with its dependencies (orjson is a compiled
+# package and is not present in the Lambda runtime, so it must ship in
+# the zip; wheels are resolved for the Lambda platform, not the build host)
 echo -e "${GREEN}Packaging Lambda function...${NC}"
-zip -r function.zip lambda_function.py
+rm -rf package function.zip
+pip install -r requirements.txt -t package \
+    --platform manylinux2014_x86_64 \
+    --implementation cp \
+    --python-version 3.12 \
+    --only-binary=:all: \
+    --quiet
+(cd package && zip -q -r ../function.zip .)
+zip -q -g function.zip lambda_function.py
+rm -rf package
 
 # Check if function exists
 if aws lambda get-function --function-name $FUNCTION_NAME --region $REGION --profile $AWS_PROFILE &> /dev/null; then
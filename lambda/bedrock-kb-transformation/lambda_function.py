@@ -3,12 +3,73 @@ Bedrock Knowledge Base Custom Transformation Lambda
 Preserves tables and charts as complete chunks while chunking regular text
 """
 
-import json
+import bisect
+import concurrent.futures
 import boto3
+import orjson
 import re
-from typing import List, Dict, Any
+from io import BytesIO
+from typing import List, Dict, Any, Tuple
 
-s3_client = boto3.client('s3')
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+# Module-scope client so warm Lambda invocations reuse pooled connections.
+# Pool size is raised above the default 10 so the parallel batch reads
+# are not throttled, and keep-alive avoids per-request TCP/TLS handshakes.
+s3_client = boto3.client('s3', config=Config(
+    max_pool_connections=64,
+    retries={'max_attempts': 3, 'mode': 'adaptive'},
+    tcp_keepalive=True
+))
+
+# Visual element markers come from Upstage pre-processing:
+# **[TABLE]**, **[CHART]**, **[DIAGRAM]**, **[IMAGE]**
+_VISUAL_MARKER_PREFIX = '**['
+_VISUAL_MARKER_SUFFIX = ']**'
+_VISUAL_TYPES = frozenset({'TABLE', 'CHART', 'DIAGRAM', 'IMAGE'})
+
+# Chunk metadata is constant per kind, so share one dict per kind instead of
+# allocating an identical dict for every chunk; nothing mutates these before
+# they are serialized. Constants that hold for the whole file (the Upstage
+# parser flag) live in fileMetadata rather than being repeated per chunk.
+_TEXT_META = {
+    'content_type': 'text',
+    'is_visual_element': False
+}
+_VISUAL_META = {
+    element_type: {
+        'content_type': element_type,
+        f'has_{element_type}': True,
+        'is_visual_element': True
+    }
+    for element_type in ('table', 'chart', 'diagram', 'image')
+}
+
+# Pre-compiled pattern -- compiled once per container instead of per call
+_SENT_SPLIT_RE = re.compile(r'(?<=[.!?])\s+')
+
+# Shared executors, created once per container so warm invocations reuse the
+# threads. S3 round trips run on the I/O pool while per-file work (including
+# chunking) runs on the worker pool, so one file's CPU-bound chunking never
+# starves another file's reads.
+_IO_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=32)
+_FILE_POOL = concurrent.futures.ThreadPoolExecutor(max_workers=8)
+
+# Objects at or above this size are downloaded as parallel ranged GETs so a
+# large batch is not bound by a single ~50 MB/s S3 stream; anything smaller
+# still goes through one plain GET
+_RANGED_GET_THRESHOLD = 16 * 1024 * 1024
+_RANGED_GET_PART = 8 * 1024 * 1024
+
+# Bodies above this size are uploaded multipart so parts move in parallel
+# instead of being bound by a single ~50 MB/s S3 stream
+_MULTIPART_THRESHOLD = 8 * 1024 * 1024
+_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=_MULTIPART_THRESHOLD,
+    multipart_chunksize=_MULTIPART_THRESHOLD,
+    max_concurrency=8
+)
 
 def lambda_handler(event, context):
     """
@@ -27,13 +88,18 @@ def lambda_handler(event, context):
     print(f"Processing ingestion job: {event.get('ingestionJobId')}")
     
     bucket_name = event['bucketName']
+    input_files = event['inputFiles']
     output_files = []
-    
+
     try:
-        for input_file in event['inputFiles']:
-            processed_file = process_file(input_file, bucket_name)
-            output_files.append(processed_file)
-        
+        # Files are independent, so process them in parallel; the bottleneck
+        # is S3 I/O, during which worker threads release the GIL
+        if input_files:
+            output_files = list(_FILE_POOL.map(
+                lambda input_file: process_file(input_file, bucket_name),
+                input_files
+            ))
+
         return {
             'outputFiles': output_files
         }
@@ -48,17 +114,22 @@ def process_file(input_file: Dict[str, Any], bucket_name: str) -> Dict[str, Any]
     
     print(f"Processing file: {input_file['originalFileLocation']}")
     
-    # Read content from S3
+    # Read content batches from S3 in parallel on the shared I/O pool;
+    # map preserves submission order, so batches stay in sequence
     content_batches = input_file['contentBatches']
-    all_content = ""
-    
-    for batch in content_batches:
-        s3_key = batch['key']
-        file_content = read_s3_json(bucket_name, s3_key)
-        
+    batch_contents = list(_IO_POOL.map(
+        lambda batch: read_s3_json(bucket_name, batch['key']),
+        content_batches
+    ))
+
+    # Collect parts in a list and join once -- repeated str += is quadratic
+    content_parts = []
+    for file_content in batch_contents:
         # Extract text from fileContents
         for content_item in file_content.get('fileContents', []):
-            all_content += content_item.get('contentBody', '') + "\n\n"
+            content_parts.append(content_item.get('contentBody', ''))
+
+    all_content = "\n\n".join(content_parts)
     
     # Perform table-aware chunking
     chunks = chunk_with_table_preservation(all_content)
@@ -68,11 +139,32 @@ def process_file(input_file: Dict[str, Any], bucket_name: str) -> Dict[str, Any]
     
     return {
         'originalFileLocation': input_file['originalFileLocation'],
-        'fileMetadata': input_file.get('fileMetadata', {}),
+        # Per-file constants ride along once here instead of once per chunk
+        'fileMetadata': {**input_file.get('fileMetadata', {}), 'parser': 'upstage'},
         'contentBatches': output_batches
     }
 
 
+def _find_visual_markers(content: str) -> List[Tuple[int, str]]:
+    """
+    Locate visual element markers as (offset, element_type) pairs
+
+    The markers are fixed literals, so a str.find loop (memchr-backed in
+    CPython) beats running the regex engine over the whole document.
+    """
+    markers = []
+    pos = content.find(_VISUAL_MARKER_PREFIX)
+    while pos != -1:
+        tag_start = pos + len(_VISUAL_MARKER_PREFIX)
+        close = content.find(_VISUAL_MARKER_SUFFIX, tag_start, tag_start + 12)
+        if close != -1 and content[tag_start:close] in _VISUAL_TYPES:
+            markers.append((pos, content[tag_start:close].lower()))
+            pos = content.find(_VISUAL_MARKER_PREFIX, close + len(_VISUAL_MARKER_SUFFIX))
+        else:
+            pos = content.find(_VISUAL_MARKER_PREFIX, pos + 1)
+    return markers
+
+
 def chunk_with_table_preservation(content: str) -> List[Dict[str, Any]]:
     """
     Split content into chunks while preserving tables and charts
@@ -86,47 +178,47 @@ def chunk_with_table_preservation(content: str) -> List[Dict[str, Any]]:
     """
     
     chunks = []
-    
-    # Split content by visual element markers
-    # Pattern matches: **[TABLE]**, **[CHART]**, **[DIAGRAM]**, **[IMAGE]**
-    pattern = r'(\*\*\[(?:TABLE|CHART|DIAGRAM|IMAGE)\]\*\*.*?)(?=\*\*\[(?:TABLE|CHART|DIAGRAM|IMAGE)\]\*\*|\Z)'
-    
-    parts = re.split(pattern, content, flags=re.DOTALL)
-    
-    for part in parts:
-        part = part.strip()
-        if not part:
-            continue
-        
-        # Check if this part is a visual element
-        if re.match(r'\*\*\[(TABLE|CHART|DIAGRAM|IMAGE)\]\*\*', part):
-            # Extract element type
-            element_type = re.search(r'\*\*\[(\w+)\]\*\*', part).group(1).lower()
-            
-            # Keep entire visual element as one chunk
+
+    # Walk the markers directly: the text before a marker is regular text,
+    # and each visual element runs from its marker to the next marker (or end).
+    # One linear pass -- no re.split, no per-part re-classification.
+    markers = _find_visual_markers(content)
+
+    prev_end = 0
+    for i, (marker_start, element_type) in enumerate(markers):
+        # Regular text between the previous element and this marker;
+        # chunk_text strips edges and drops empty input itself, so the
+        # slice goes in without a separate strip-and-check pass
+        text_chunks = chunk_text(content[prev_end:marker_start], max_tokens=500, overlap=50)
+        for text_chunk in text_chunks:
             chunks.append({
-                'contentBody': part,
+                'contentBody': text_chunk,
                 'contentType': 'TEXT',
-                'contentMetadata': {
-                    'content_type': element_type,
-                    f'has_{element_type}': True,
-                    'is_visual_element': True,
-                    'parser': 'upstage'
-                }
+                'contentMetadata': _TEXT_META
             })
-        else:
-            # Regular text - chunk it normally
-            text_chunks = chunk_text(part, max_tokens=500, overlap=50)
-            for text_chunk in text_chunks:
-                chunks.append({
-                    'contentBody': text_chunk,
-                    'contentType': 'TEXT',
-                    'contentMetadata': {
-                        'content_type': 'text',
-                        'is_visual_element': False,
-                        'parser': 'upstage'
-                    }
-                })
+
+        # Visual element: marker plus everything up to the next marker.
+        # The slice starts at the marker itself, so only the tail can
+        # carry whitespace
+        next_start = markers[i + 1][0] if i + 1 < len(markers) else len(content)
+        element_part = content[marker_start:next_start].rstrip()
+
+        # Keep entire visual element as one chunk
+        chunks.append({
+            'contentBody': element_part,
+            'contentType': 'TEXT',
+            'contentMetadata': _VISUAL_META[element_type]
+        })
+        prev_end = next_start
+
+    # Trailing regular text (or the whole document when there are no markers)
+    text_chunks = chunk_text(content[prev_end:], max_tokens=500, overlap=50)
+    for text_chunk in text_chunks:
+        chunks.append({
+            'contentBody': text_chunk,
+            'contentType': 'TEXT',
+            'contentMetadata': _TEXT_META
+        })
     
     print(f"Created {len(chunks)} chunks from Upstage-parsed content")
     return chunks
@@ -140,42 +232,88 @@ def chunk_text(text: str, max_tokens: int = 500, overlap: int = 50) -> List[str]
     
     # Approximate: 1 token ≈ 4 characters
     max_chars = max_tokens * 4
-    overlap_chars = overlap * 4
-    
-    # Split by sentences
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    
+
+    # Fast path: everything fits in one chunk, skip the sentence scan
+    stripped = text.strip()
+    if len(stripped) <= max_chars:
+        return [stripped] if stripped else []
+
+    # Record sentence spans as offsets in one scan instead of materializing a
+    # list of sentence substrings; the end offsets double as the prefix sums
+    # used for boundary search, and each chunk is emitted as a single slice
+    sent_starts = []
+    sent_ends = []
+    prev = 0
+    for boundary in _SENT_SPLIT_RE.finditer(text):
+        sent_starts.append(prev)
+        sent_ends.append(boundary.start())
+        prev = boundary.end()
+    # Text ending in punctuation plus whitespace leaves nothing after the
+    # last boundary; appending an empty span there would emit a chunk that
+    # is nothing but the carried overlap text
+    if prev < len(text):
+        sent_starts.append(prev)
+        sent_ends.append(len(text))
+
     chunks = []
-    current_chunk = ""
-    
-    for sentence in sentences:
-        # If adding this sentence exceeds max, start new chunk
-        if len(current_chunk) + len(sentence) > max_chars and current_chunk:
-            chunks.append(current_chunk.strip())
-            
-            # Add overlap from end of previous chunk
-            if overlap > 0:
-                words = current_chunk.split()
-                overlap_text = ' '.join(words[-overlap:])
-                current_chunk = overlap_text + " " + sentence
-            else:
-                current_chunk = sentence
-        else:
-            current_chunk += " " + sentence if current_chunk else sentence
-    
-    # Add final chunk
-    if current_chunk.strip():
-        chunks.append(current_chunk.strip())
-    
+    overlap_text = ''
+    i = 0
+    n = len(sent_starts)
+
+    while i < n:
+        start = sent_starts[i]
+        # Budget left after the carried-over overlap text
+        limit = max_chars - len(overlap_text) if overlap_text else max_chars + 1
+        j = bisect.bisect_right(sent_ends, start + limit, i)
+        if j <= i:
+            # A single sentence longer than the budget still forms one chunk
+            j = i + 1
+
+        body = text[start:sent_ends[j - 1]]
+        chunk = (overlap_text + ' ' + body if overlap_text else body).strip()
+        if chunk:
+            chunks.append(chunk)
+
+            # Carry overlap from end of this chunk into the next one.
+            # rsplit with maxsplit only tokenizes the tail of the chunk,
+            # so this is O(overlap) instead of re-splitting the whole chunk
+            if overlap > 0 and j < n:
+                tail = chunk.rsplit(None, overlap)
+                overlap_text = ' '.join(tail[1:] if len(tail) > overlap else tail)
+        i = j
+
     return chunks
 
 
 def read_s3_json(bucket: str, key: str) -> Dict[str, Any]:
     """Read JSON file from S3"""
     try:
+        size = s3_client.head_object(Bucket=bucket, Key=key)['ContentLength']
+
+        if size >= _RANGED_GET_THRESHOLD:
+            # Fetch 8 MB ranges in parallel, each worker writing straight
+            # into its slice of one preallocated buffer -- no per-part bytes
+            # objects and no b''.join copy of the whole object afterwards
+            buffer = bytearray(size)
+            view = memoryview(buffer)
+
+            def fetch_range(offset):
+                end = min(offset + _RANGED_GET_PART, size) - 1
+                body = s3_client.get_object(
+                    Bucket=bucket,
+                    Key=key,
+                    Range=f'bytes={offset}-{end}'
+                )['Body'].read()
+                view[offset:offset + len(body)] = body
+
+            offsets = range(0, size, _RANGED_GET_PART)
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(offsets))) as executor:
+                list(executor.map(fetch_range, offsets))
+            return orjson.loads(buffer)
+
         response = s3_client.get_object(Bucket=bucket, Key=key)
-        content = response['Body'].read().decode('utf-8')
-        return json.loads(content)
+        # orjson parses the UTF-8 bytes directly -- no intermediate str copy
+        return orjson.loads(response['Body'].read())
     except Exception as e:
         print(f"Error reading S3 object {bucket}/{key}: {str(e)}")
         raise
@@ -183,7 +321,12 @@ def read_s3_json(bucket: str, key: str) -> Dict[str, Any]:
 
 def write_chunks_to_s3(chunks: List[Dict[str, Any]], bucket: str, input_file: Dict[str, Any]) -> List[Dict[str, str]]:
     """Write chunks to S3 and return batch references"""
-    
+
+    # Nothing to write -- skip the S3 round trip entirely
+    if not chunks:
+        print(f"No chunks produced for {input_file['originalFileLocation']}, skipping write")
+        return []
+
     # Generate unique key for this file's chunks
     original_uri = input_file['originalFileLocation']['s3_location']['uri']
     file_id = original_uri.split('/')[-1].replace('.', '_')
@@ -195,14 +338,27 @@ def write_chunks_to_s3(chunks: List[Dict[str, Any]], bucket: str, input_file: Di
         'fileContents': chunks
     }
     
-    # Write to S3
-    s3_client.put_object(
-        Bucket=bucket,
-        Key=output_key,
-        Body=json.dumps(file_contents),
-        ContentType='application/json'
-    )
-    
+    body = orjson.dumps(file_contents)
+
+    # Write to S3. The output stays plain JSON: Bedrock KB ingestion reads
+    # these objects and is not confirmed to honor Content-Encoding, so the
+    # payload encoding is part of the contract
+    if len(body) > _MULTIPART_THRESHOLD:
+        s3_client.upload_fileobj(
+            BytesIO(body),
+            bucket,
+            output_key,
+            ExtraArgs={'ContentType': 'application/json'},
+            Config=_TRANSFER_CONFIG
+        )
+    else:
+        s3_client.put_object(
+            Bucket=bucket,
+            Key=output_key,
+            Body=body,
+            ContentType='application/json'
+        )
+
     print(f"Wrote chunks to s3://{bucket}/{output_key}")
     
     return [{